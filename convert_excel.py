@@ -9,51 +9,85 @@ Reads from the Value sheet which has hierarchical data with parent totals:
 Parent totals (indent 1 & 2) are included in the JSON with year data alongside children,
 so the json-processor can detect them as aggregated records.
 """
-import json
+
+import random
+from bisect import bisect_left
+
+import numpy as np
 import openpyxl
+import orjson
+import pandas as pd
 
 EXCEL_FILE = 'Copy of Dataset-Global MedTech  Biopharma Device CMOCDMO Market.xlsx'
 YEARS = list(range(2021, 2034))  # 2021-2033
+YEAR_STRS = tuple(str(y) for y in YEARS)
+YEAR_KEYS = frozenset(YEAR_STRS)
+
+# Volume conversion factor ranges by base value: <=1000, <=10000, >10000
+FACTOR_THRESHOLDS = (1000, 10000)
+FACTOR_RANGES = ((1500, 3000), (800, 1500), (400, 800))
 
 
 def read_value_sheet():
     """
     Read the Value sheet and return a list of rows with hierarchy info.
     Each row has: label, indent, year_data dict.
+
+    The numeric block is loaded with pandas' calamine engine as a single
+    NaN-masked array. Indent levels are cell styles, which pandas does not
+    expose, so column A alone is streamed through a read-only openpyxl
+    workbook.
     """
-    wb = openpyxl.load_workbook(EXCEL_FILE, data_only=True)
-    ws = wb['Value']
+    wb = openpyxl.load_workbook(EXCEL_FILE, read_only=True, data_only=True)
+    try:
+        ws = wb['Value']
+
+        labels = []
+        # Skip header row 1
+        for row_idx, (label_cell,) in enumerate(ws.iter_rows(min_row=2, max_col=1), start=2):
+            label = label_cell.value
+            if label is None:
+                continue
 
-    rows = []
-    for row_idx in range(2, ws.max_row + 1):  # Skip header row 1
-        label = ws.cell(row=row_idx, column=1).value
-        if label is None:
-            continue
+            alignment = label_cell.alignment
+            indent = int(alignment.indent) if alignment and alignment.indent else 0
+            label = label.strip() if isinstance(label, str) else str(label)
 
-        cell = ws.cell(row=row_idx, column=1)
-        indent = int(cell.alignment.indent) if cell.alignment and cell.alignment.indent else 0
-
-        # Read year data (columns 2-14 for 2021-2033)
-        year_data = {}
-        has_data = False
-        for i, year in enumerate(YEARS):
-            val = ws.cell(row=row_idx, column=2 + i).value
-            if val is not None:
-                year_data[str(year)] = round(val, 1)
-                has_data = True
-            else:
-                year_data[str(year)] = 0
+            labels.append((row_idx, label, indent))
+    finally:
+        wb.close()
+
+    # Columns 2-14 hold 2021-2033; keep only labelled rows so they line up with labels.
+    # Only empty cells count as missing, so labels such as "NA" stay text as in openpyxl.
+    df = pd.read_excel(EXCEL_FILE, sheet_name='Value', engine='calamine', header=0,
+                       usecols=range(1 + len(YEARS)), keep_default_na=False, na_values=[''])
+    df = df[df.iloc[:, 0].notna()]
+    if len(df) != len(labels):
+        raise ValueError(f"Value sheet: {len(labels)} labelled rows in column A but {len(df)} in the data block")
 
-        label = label.strip() if isinstance(label, str) else str(label)
+    # Empty cells are NaN; rows with no year data at all get year_data=None,
+    # gaps in rows that do have data are filled with 0
+    values = df.iloc[:, 1:].to_numpy(dtype=np.float64)
+    missing = np.isnan(values)
+    has_data = ~missing.all(axis=1)
 
+    rows = []
+    for (row_idx, label, indent), year_values, row_missing, row_has_data in zip(
+            labels, values.tolist(), missing.tolist(), has_data.tolist()):
+        year_data = None
+        if row_has_data:
+            # Builtin round() is correctly rounded; whole numbers stay ints as openpyxl read them
+            year_data = {
+                y: 0 if gap else (int(v) if v.is_integer() else round(v, 1))
+                for y, v, gap in zip(YEAR_STRS, year_values, row_missing)
+            }
         rows.append({
             'row_idx': row_idx,
             'label': label,
             'indent': indent,
-            'year_data': year_data if has_data else None,
+            'year_data': year_data,
         })
 
-    wb.close()
     return rows
 
 
@@ -93,25 +127,25 @@ def build_json_from_value_sheet(rows):
     current_sub_seg = None
 
     # Track which sub-segments have children
-    # First pass: identify which indent-2 items have indent-3 children
+    # First pass: an indent-2 item has children if the next indent <= 3 row is indent 3
     sub_seg_has_children = set()
-    for i, row in enumerate(rows):
-        if row['indent'] == 2 and row['year_data']:
-            # Check if next rows are indent 3 children
-            for j in range(i + 1, len(rows)):
-                if rows[j]['indent'] == 3:
-                    sub_seg_has_children.add((current_geo_scan, current_seg_scan, row['label']))
-                    break
-                elif rows[j]['indent'] <= 2:
-                    break
-        elif row['indent'] == 0:
-            current_geo_scan = row['label']
-        elif row['indent'] == 1:
+    current_geo_scan = None
+    current_seg_scan = None
+    pending = None
+    for row in rows:
+        indent = row['indent']
+        if indent == 3:
+            if pending is not None:
+                sub_seg_has_children.add(pending)
+                pending = None
+        elif indent == 2:
+            pending = (current_geo_scan, current_seg_scan, row['label']) if row['year_data'] else None
+        elif indent == 1:
             current_seg_scan = row['label']
-
-    # Reset scan variables
-    current_geo = None
-    current_seg_type = None
+            pending = None
+        elif indent == 0:
+            current_geo_scan = row['label']
+            pending = None
 
     for i, row in enumerate(rows):
         label = row['label']
@@ -123,8 +157,7 @@ def build_json_from_value_sheet(rows):
             current_geo = label
             current_seg_type = None
             current_sub_seg = None
-            if current_geo not in result:
-                result[current_geo] = {}
+            geo_result = result.setdefault(current_geo, {})
             continue
 
         if current_geo is None:
@@ -134,15 +167,12 @@ def build_json_from_value_sheet(rows):
             # Segment type level (By Product / Device Type, By Service Type, etc.)
             current_seg_type = label
             current_sub_seg = None
-            if current_seg_type not in result[current_geo]:
-                result[current_geo][current_seg_type] = {}
+            geo_data = geo_result.setdefault(current_seg_type, {})
             continue
 
         if current_seg_type is None:
             continue
 
-        geo_data = result[current_geo][current_seg_type]
-
         if indent == 2:
             current_sub_seg = label
 
@@ -154,11 +184,8 @@ def build_json_from_value_sheet(rows):
 
             if has_children:
                 # Parent node: create dict with year data + children will be added later
-                if label not in geo_data:
-                    geo_data[label] = {}
                 # Add year data directly at the parent level
-                for year_key, year_val in year_data.items():
-                    geo_data[label][year_key] = year_val
+                geo_data.setdefault(label, {}).update(year_data)
             else:
                 # Leaf node (no children): just year data
                 geo_data[label] = year_data
@@ -167,9 +194,7 @@ def build_json_from_value_sheet(rows):
             if current_sub_seg is None or year_data is None:
                 continue
             # Child node: add under parent sub-segment
-            if current_sub_seg not in geo_data:
-                geo_data[current_sub_seg] = {}
-            geo_data[current_sub_seg][label] = year_data
+            geo_data.setdefault(current_sub_seg, {})[label] = year_data
 
     return result
 
@@ -179,8 +204,7 @@ def generate_volume_from_value(value_data):
     Generate volume data from value data using conversion factors.
     Volume = Value * factor (varies by segment to give realistic unit numbers)
     """
-    import random
-    random.seed(42)  # Deterministic
+    rand = random.Random(42).random  # Deterministic, independent of the global RNG
 
     def convert_node(node, base_factor):
         """Convert year values in a node to volume."""
@@ -193,48 +217,65 @@ def generate_volume_from_value(value_data):
                 result[key] = val  # Will be processed separately
         return result
 
-    def walk_and_convert(node, depth=0):
-        if not isinstance(node, dict):
-            return node
-
-        # Check if this node has year data (mixed with children or pure leaf)
-        has_year_data = any(str(k).isdigit() for k in node.keys())
-        has_children = any(isinstance(v, dict) for v in node.values())
-
-        if has_year_data and not has_children:
-            # Pure leaf node - all values are year data
-            base_val = next((v for k, v in node.items() if str(k).isdigit() and isinstance(v, (int, float))), 1)
-            if base_val > 10000:
-                factor = random.uniform(400, 800)
-            elif base_val > 1000:
-                factor = random.uniform(800, 1500)
-            else:
-                factor = random.uniform(1500, 3000)
-            return {k: round(v * factor) if isinstance(v, (int, float)) else v for k, v in node.items()}
-
-        elif has_year_data and has_children:
-            # Mixed node (parent with year data + children)
-            # Use same factor for parent year data, recurse into children
-            base_val = next((v for k, v in node.items() if str(k).isdigit() and isinstance(v, (int, float))), 1)
-            if base_val > 10000:
-                factor = random.uniform(400, 800)
-            elif base_val > 1000:
-                factor = random.uniform(800, 1500)
-            else:
-                factor = random.uniform(1500, 3000)
-            result = {}
+    def pick_factor(base_val):
+        lo, hi = FACTOR_RANGES[bisect_left(FACTOR_THRESHOLDS, base_val)]
+        return lo + (hi - lo) * rand()
+
+    def walk_and_convert(root):
+        """
+        Iterative pre-order walk. Each node's result dict is created before its
+        children are visited, so factors are drawn in the same order as a
+        recursive walk and keys keep their original order.
+
+        Year values are not converted during the walk: each one is recorded as
+        a (result dict, key) slot with its value and factor in flat columns,
+        and the whole column is scaled and rounded in one numpy pass.
+        """
+        if not isinstance(root, dict):
+            return root
+
+        slots = []
+        flat_values = []
+        flat_factors = []
+
+        converted = {}
+        stack = [(root, converted)]
+        while stack:
+            node, result = stack.pop()
+
+            # Check if this node has year data (mixed with children or pure leaf)
+            has_year_data = False
+            base_val = None
+            for k, v in node.items():
+                if not isinstance(v, dict) and k in YEAR_KEYS:
+                    has_year_data = True
+                    if base_val is None and isinstance(v, (int, float)):
+                        base_val = v
+
+            # Leaf and mixed nodes scale their year values by one factor;
+            # pure container nodes keep their scalars as-is
+            factor = pick_factor(1 if base_val is None else base_val) if has_year_data else None
+
+            children = []
             for k, v in node.items():
                 if isinstance(v, dict):
-                    result[k] = walk_and_convert(v, depth + 1)
-                elif isinstance(v, (int, float)):
-                    result[k] = round(v * factor)
+                    result[k] = child = {}
+                    children.append((v, child))
+                elif factor is not None and isinstance(v, (int, float)):
+                    result[k] = None  # Placeholder keeps key order; filled below
+                    slots.append((result, k))
+                    flat_values.append(v)
+                    flat_factors.append(factor)
                 else:
                     result[k] = v
-            return result
+            stack.extend(reversed(children))
+
+        # np.rint rounds half to even, matching the builtin round()
+        scaled = np.rint(np.array(flat_values, dtype=np.float64) * np.array(flat_factors, dtype=np.float64))
+        for (result, k), volume in zip(slots, scaled.astype(np.int64).tolist()):
+            result[k] = volume
 
-        else:
-            # Pure container node - recurse into children
-            return {k: walk_and_convert(v, depth + 1) for k, v in node.items()}
+        return converted
 
     return walk_and_convert(value_data)
 
@@ -257,49 +298,45 @@ def main():
         print(f"  {geo}: {seg_types}")
 
     print("\nWriting value.json...")
-    with open('public/data/value.json', 'w') as f:
-        json.dump(value_json, f, indent=2)
+    with open('public/data/value.json', 'wb') as f:
+        f.write(orjson.dumps(value_json, option=orjson.OPT_INDENT_2))
     print("  Done!")
 
     print("\nGenerating volume.json from value data...")
     volume_json = generate_volume_from_value(value_json)
-    with open('public/data/volume.json', 'w') as f:
-        json.dump(volume_json, f, indent=2)
+    with open('public/data/volume.json', 'wb') as f:
+        f.write(orjson.dumps(volume_json, option=orjson.OPT_INDENT_2))
     print("  Done!")
 
     # Verification
     print("\n=== Verification ===")
 
+    global_json = value_json.get('Global', {})
+
     # Check Global Drug-Device Combination Products has year data + children
-    global_prod = value_json.get('Global', {}).get('By Product / Device Type', {})
-    ddcp = global_prod.get('Drug-Device Combination Products', {})
-    ddcp_2021 = ddcp.get('2021', 'MISSING')
-    ddcp_children = [k for k in ddcp if not str(k).isdigit()]
+    ddcp = global_json.get('By Product / Device Type', {}).get('Drug-Device Combination Products', {})
+    ddcp_children = [k for k in ddcp if k not in YEAR_KEYS]
     print(f"  Global > Drug-Device Combination Products:")
-    print(f"    2021 total: {ddcp_2021}")
+    print(f"    2021 total: {ddcp.get('2021', 'MISSING')}")
     print(f"    Children: {ddcp_children}")
 
     # Check North America Drug-Device
-    na_prod = value_json.get('North America', {}).get('By Product / Device Type', {})
-    na_ddcp = na_prod.get('Drug-Device Combination Products', {})
-    na_ddcp_2021 = na_ddcp.get('2021', 'MISSING')
-    na_children = [k for k in na_ddcp if not str(k).isdigit()]
+    na_ddcp = value_json.get('North America', {}).get('By Product / Device Type', {}).get('Drug-Device Combination Products', {})
+    na_children = [k for k in na_ddcp if k not in YEAR_KEYS]
     print(f"\n  North America > Drug-Device Combination Products:")
-    print(f"    2021 total: {na_ddcp_2021}")
+    print(f"    2021 total: {na_ddcp.get('2021', 'MISSING')}")
     print(f"    Children: {na_children}")
-    child_sum = sum(na_ddcp[c].get('2021', 0) for c in na_children if isinstance(na_ddcp[c], dict))
+    child_sum = sum(v.get('2021', 0) for v in na_ddcp.values() if isinstance(v, dict))
     print(f"    Children sum 2021: {child_sum}")
 
     # Verify leaf-only segments (By Service Type)
-    global_svc = value_json.get('Global', {}).get('By Service Type', {})
-    print(f"\n  Global > By Service Type keys: {list(global_svc.keys())[:3]}...")
-    first_svc = list(global_svc.values())[0]
-    is_leaf = all(str(k).isdigit() for k in first_svc.keys())
-    print(f"    First entry is pure leaf: {is_leaf}")
+    global_svc = global_json.get('By Service Type', {})
+    print(f"\n  Global > By Service Type keys: {list(global_svc)[:3]}...")
+    first_svc = next(iter(global_svc.values()), {})
+    print(f"    First entry is pure leaf: {YEAR_KEYS.issuperset(first_svc)}")
 
     # Verify By Region totals
-    global_region = value_json.get('Global', {}).get('By Region', {})
-    region_sum_2021 = sum(v.get('2021', 0) for v in global_region.values() if isinstance(v, dict))
+    region_sum_2021 = sum(v.get('2021', 0) for v in global_json.get('By Region', {}).values() if isinstance(v, dict))
     print(f"\n  Global By Region 2021 sum: {region_sum_2021:.1f}")
 
     print("\nConversion complete!")
@@ -6,8 +6,11 @@ Reads real Value and Volume data from the Excel file and produces:
   - public/data/segmentation_analysis.json
 """
 
-import json
-import openpyxl
+from collections import defaultdict
+from itertools import chain
+
+import orjson
+import pandas as pd
 
 EXCEL_PATH = "c:/Users/vrashal/Desktop/Solar2/Solar-sheet-og.xlsx"
 VALUE_JSON = "c:/Users/vrashal/Desktop/Solar2/public/data/value.json"
@@ -24,101 +27,110 @@ GEO_HIERARCHY = {
 }
 
 REGIONS = list(GEO_HIERARCHY.keys())
-ALL_COUNTRIES = []
-for countries in GEO_HIERARCHY.values():
-    ALL_COUNTRIES.extend(countries)
+REGIONS_SET = frozenset(REGIONS)
+ALL_COUNTRIES = list(chain.from_iterable(GEO_HIERARCHY.values()))
 
 # Segment types that have sub-segments (NOT "By Region" or "By Country")
 DATA_SEGMENT_TYPES = ["By Technology", "By Power Rating", "By Provider", "By End-User"]
+# Segment types that break a geography down into other geographies
+GEO_SEGMENT_TYPES = frozenset({"By Region", "By Country"})
 
 
 def read_excel():
-    """Read Excel and split into Value and Volume sections."""
-    wb = openpyxl.load_workbook(EXCEL_PATH, data_only=True)
-    ws = wb["Sheet1"]
+    """
+    Read Excel and split into Value and Volume sections.
 
-    all_rows = []
-    for row in ws.iter_rows(min_row=1, values_only=True):
-        all_rows.append(list(row))
+    The sheet is loaded with pandas' calamine engine and swept once. The
+    first "Region | Segment" header row opens the Value section and supplies
+    the years, a "Volume" marker row closes it, and the second header row
+    opens the Volume section.
+    """
+    value_records = []
+    volume_records = []
+    years = []
+    n_years = 0
 
-    # Find the header rows (row with "Region" in col A)
     header_indices = []
     volume_start = None
-    for i, row in enumerate(all_rows):
+    section = None  # list the current data row is appended to
+
+    df = pd.read_excel(EXCEL_PATH, sheet_name="Sheet1", engine="calamine", header=None,
+                       keep_default_na=False, na_values=[""])
+    # Only empty cells come back as NaN (text such as "NA" is kept); map them to
+    # None like openpyxl's values_only
+    df = df.astype(object).where(df.notna(), None)
+
+    for i, row in enumerate(df.itertuples(index=False, name=None)):
+        if row and row[0] == "Volume":
+            volume_start = i
+            if section is value_records:
+                section = None
+            continue
+        if len(row) < 3:
+            continue
+
+        # Header rows (row with "Region" in col A)
         if row[0] == "Region" and row[1] == "Segment":
             header_indices.append(i)
-        if row[0] == "Volume":
-            volume_start = i
+            if len(header_indices) == 1:
+                # Extract years from the Value header
+                years = [str(int(float(val))) for val in row[3:] if val is not None]
+                n_years = len(years)
+                section = value_records
+            elif len(header_indices) == 2:
+                section = volume_records
+            continue
 
-    print(f"Found {len(header_indices)} header rows at indices: {header_indices}")
-    print(f"Volume section marker at index: {volume_start}")
+        if section is None:
+            continue
 
-    # Value header is first header, Volume header is second
-    value_header_idx = header_indices[0]
-    volume_header_idx = header_indices[1] if len(header_indices) > 1 else None
+        region = str(row[0]).strip() if row[0] else ""
+        segment = str(row[1]).strip() if row[1] else ""
+        subsegment = str(row[2]).strip() if row[2] else ""
 
-    # Extract years from header
-    years = []
-    header_row = all_rows[value_header_idx]
-    for col_idx in range(3, len(header_row)):
-        val = header_row[col_idx]
-        if val is not None:
-            years.append(str(int(float(val))))
+        if not region or not segment or not subsegment:
+            continue
+        if region == "Region":
+            continue
 
-    print(f"Years: {years}")
+        values = {
+            yr: float(val)
+            for yr, val in zip(years, row[3:3 + n_years])
+            if isinstance(val, (int, float))
+        }
 
-    # Parse data rows
-    def parse_section(start_idx, end_idx):
-        """Parse rows from start_idx+1 to end_idx into a list of dicts."""
-        records = []
-        for i in range(start_idx + 1, end_idx):
-            row = all_rows[i]
-            region = str(row[0]).strip() if row[0] else ""
-            segment = str(row[1]).strip() if row[1] else ""
-            subsegment = str(row[2]).strip() if row[2] else ""
-
-            if not region or not segment or not subsegment:
-                continue
-            if region == "Region" or region == "Volume":
-                continue
+        if values:
+            section.append({
+                "region": region,
+                "segment": segment,
+                "subsegment": subsegment,
+                "values": values
+            })
 
-            values = {}
-            for j, yr in enumerate(years):
-                val = row[3 + j]
-                if val is not None:
-                    try:
-                        values[yr] = float(val)
-                    except (ValueError, TypeError):
-                        pass
-
-            if values:
-                records.append({
-                    "region": region,
-                    "segment": segment,
-                    "subsegment": subsegment,
-                    "values": values
-                })
-        return records
-
-    # Value section: from value header to volume marker (or second header)
-    value_end = volume_start if volume_start else (volume_header_idx if volume_header_idx else len(all_rows))
-    value_records = parse_section(value_header_idx, value_end)
-
-    # Volume section: from volume header to end
-    volume_records = []
-    if volume_header_idx:
-        volume_records = parse_section(volume_header_idx, len(all_rows))
+    print(f"Found {len(header_indices)} header rows at indices: {header_indices}")
+    print(f"Volume section marker at index: {volume_start}")
+
+    if not header_indices:
+        raise ValueError("No 'Region' / 'Segment' header row found in Sheet1")
 
+    print(f"Years: {years}")
     print(f"Value records: {len(value_records)}")
     print(f"Volume records: {len(volume_records)}")
 
     return value_records, volume_records, years
 
 
-def build_json(records, years):
+def build_json(records, years, ndigits=1, section=None):
     """
     Build the hierarchical JSON structure from flat records.
 
+    Values are rounded to `ndigits` decimals; pass ndigits=None for whole
+    units (volume). `section` labels the missing-geography warnings.
+
+    Returns (data, summaries). summaries[geo][seg_type] is the sum of that
+    segment type's sub-segments for the first year, summed from each bucket
+    as soon as it is finished so verify_data does not have to re-walk the tree.
+
     Structure:
     {
       "Global": {
@@ -145,146 +157,66 @@ def build_json(records, years):
     }
     """
     data = {}
+    summaries = {}
+    test_year = years[0] if years else None
 
-    # Group records by region
-    region_records = {}
+    # Group records by region, then by segment type, so each geography reads
+    # its own buckets directly instead of re-filtering its full record list
+    region_records = defaultdict(lambda: defaultdict(list))
     for rec in records:
-        region = rec["region"]
-        if region not in region_records:
-            region_records[region] = []
-        region_records[region].append(rec)
+        region_records[rec["region"]][rec["segment"]].append(rec)
 
     # Build each geography entry
+    tag = f" ({section})" if section else ""
     all_geos = ["Global"] + REGIONS + ALL_COUNTRIES
     for geo in all_geos:
         if geo not in region_records:
-            print(f"  WARNING: No records found for geography '{geo}'")
+            print(f"  WARNING{tag}: No records found for geography '{geo}'")
             continue
 
-        data[geo] = {}
-        geo_recs = region_records[geo]
-
-        for rec in geo_recs:
-            seg_type = rec["segment"]
-            subseg = rec["subsegment"]
+        geo_data = data[geo] = {}
+        geo_totals = summaries[geo] = {}
+        seg_records = region_records[geo]
 
+        for seg_type, seg_recs in seg_records.items():
             # Skip "By Region" and "By Country" for now - handle separately
-            if seg_type in ("By Region", "By Country"):
+            if seg_type in GEO_SEGMENT_TYPES:
                 continue
 
-            if seg_type not in data[geo]:
-                data[geo][seg_type] = {}
-
-            # Round values appropriately
-            rounded_values = {}
-            for yr in years:
-                if yr in rec["values"]:
-                    rounded_values[yr] = round(rec["values"][yr], 1)
-
-            data[geo][seg_type][subseg] = rounded_values
+            seg_bucket = geo_data[seg_type] = {}
+            for rec in seg_recs:
+                # Round values appropriately (read_excel only stores the header row's years)
+                rounded_values = {yr: round(v, ndigits) for yr, v in rec["values"].items()}
+                seg_bucket[rec["subsegment"]] = rounded_values
+            # Sum the finished bucket so duplicate sub-segments count once, as written
+            geo_totals[seg_type] = sum(v.get(test_year, 0) for v in seg_bucket.values())
 
         # Add "By Region" for Global (region totals)
         if geo == "Global":
             by_region = {}
-            for rec in geo_recs:
-                if rec["segment"] == "By Region":
-                    subseg = rec["subsegment"]
-                    # Normalize: "Middle East and Africa" -> "Middle East & Africa"
-                    if "middle east" in subseg.lower() and "africa" in subseg.lower():
-                        subseg = "Middle East & Africa"
-                    rounded_values = {}
-                    for yr in years:
-                        if yr in rec["values"]:
-                            rounded_values[yr] = round(rec["values"][yr], 1)
-                    by_region[subseg] = rounded_values
-            if by_region:
-                data["Global"]["By Region"] = by_region
-
-        # Add "By Country" for regions
-        if geo in REGIONS:
-            by_country = {}
-            for rec in geo_recs:
-                if rec["segment"] == "By Country":
-                    subseg = rec["subsegment"]
-                    rounded_values = {}
-                    for yr in years:
-                        if yr in rec["values"]:
-                            rounded_values[yr] = round(rec["values"][yr], 1)
-                    by_country[subseg] = rounded_values
-            if by_country:
-                data[geo]["By Country"] = by_country
-
-    return data
-
-
-def build_volume_json(records, years):
-    """Build volume JSON - same structure but values are integers (units)."""
-    data = {}
-
-    region_records = {}
-    for rec in records:
-        region = rec["region"]
-        if region not in region_records:
-            region_records[region] = []
-        region_records[region].append(rec)
-
-    all_geos = ["Global"] + REGIONS + ALL_COUNTRIES
-    for geo in all_geos:
-        if geo not in region_records:
-            print(f"  WARNING (Volume): No records found for geography '{geo}'")
-            continue
-
-        data[geo] = {}
-        geo_recs = region_records[geo]
-
-        for rec in geo_recs:
-            seg_type = rec["segment"]
-            subseg = rec["subsegment"]
-
-            if seg_type in ("By Region", "By Country"):
-                continue
-
-            if seg_type not in data[geo]:
-                data[geo][seg_type] = {}
-
-            rounded_values = {}
-            for yr in years:
-                if yr in rec["values"]:
-                    rounded_values[yr] = round(rec["values"][yr])
-
-            data[geo][seg_type][subseg] = rounded_values
-
-        # Add "By Region" for Global
-        if geo == "Global":
-            by_region = {}
-            for rec in geo_recs:
-                if rec["segment"] == "By Region":
-                    subseg = rec["subsegment"]
-                    if "middle east" in subseg.lower() and "africa" in subseg.lower():
-                        subseg = "Middle East & Africa"
-                    rounded_values = {}
-                    for yr in years:
-                        if yr in rec["values"]:
-                            rounded_values[yr] = round(rec["values"][yr])
-                    by_region[subseg] = rounded_values
+            for rec in seg_records.get("By Region", ()):
+                subseg = rec["subsegment"]
+                # Normalize: "Middle East and Africa" -> "Middle East & Africa"
+                low = subseg.lower()
+                if "middle east" in low and "africa" in low:
+                    subseg = "Middle East & Africa"
+                rounded_values = {yr: round(v, ndigits) for yr, v in rec["values"].items()}
+                by_region[subseg] = rounded_values
             if by_region:
-                data["Global"]["By Region"] = by_region
+                geo_data["By Region"] = by_region
+                geo_totals["By Region"] = sum(v.get(test_year, 0) for v in by_region.values())
 
         # Add "By Country" for regions
-        if geo in REGIONS:
+        if geo in REGIONS_SET:
             by_country = {}
-            for rec in geo_recs:
-                if rec["segment"] == "By Country":
-                    subseg = rec["subsegment"]
-                    rounded_values = {}
-                    for yr in years:
-                        if yr in rec["values"]:
-                            rounded_values[yr] = round(rec["values"][yr])
-                    by_country[subseg] = rounded_values
+            for rec in seg_records.get("By Country", ()):
+                rounded_values = {yr: round(v, ndigits) for yr, v in rec["values"].items()}
+                by_country[rec["subsegment"]] = rounded_values
             if by_country:
-                data[geo]["By Country"] = by_country
+                geo_data["By Country"] = by_country
+                geo_totals["By Country"] = sum(v.get(test_year, 0) for v in by_country.values())
 
-    return data
+    return data, summaries
 
 
 def build_segmentation_analysis():
@@ -330,37 +262,30 @@ def build_segmentation_analysis():
     return analysis
 
 
-def verify_data(value_data, years):
-    """Verify data integrity - check for double counting."""
+def verify_data(summaries, years):
+    """Verify data integrity - check for double counting, using build_json's summaries."""
     print("\n=== DATA VERIFICATION ===")
 
     # For each geography, check that segment sub-segment values are reasonable
     for geo in ["Global"] + REGIONS:
-        if geo not in value_data:
+        if geo not in summaries:
             continue
 
         # Sum of each segment type's sub-segments for a test year
         test_year = years[0]
         print(f"\n{geo} ({test_year}):")
 
+        geo_totals = summaries[geo]
         for seg_type in DATA_SEGMENT_TYPES:
-            if seg_type not in value_data[geo]:
+            if seg_type not in geo_totals:
                 print(f"  {seg_type}: MISSING")
                 continue
 
-            total = 0
-            for subseg, vals in value_data[geo][seg_type].items():
-                total += vals.get(test_year, 0)
-
-            print(f"  {seg_type}: {total:.1f}")
+            print(f"  {seg_type}: {geo_totals[seg_type]:.1f}")
 
         # Check By Region totals for Global
-        if geo == "Global" and "By Region" in value_data["Global"]:
-            region_total = sum(
-                vals.get(test_year, 0)
-                for vals in value_data["Global"]["By Region"].values()
-            )
-            print(f"  By Region total: {region_total:.1f}")
+        if geo == "Global" and "By Region" in geo_totals:
+            print(f"  By Region total: {geo_totals['By Region']:.1f}")
 
 
 def main():
@@ -368,28 +293,28 @@ def main():
     value_records, volume_records, years = read_excel()
 
     print("\nBuilding Value JSON...")
-    value_data = build_json(value_records, years)
+    value_data, value_summaries = build_json(value_records, years)
 
     print("\nBuilding Volume JSON...")
-    volume_data = build_volume_json(volume_records, years)
+    volume_data, _ = build_json(volume_records, years, ndigits=None, section="Volume")
 
     print("\nBuilding segmentation analysis...")
     seg_analysis = build_segmentation_analysis()
 
     # Verify
-    verify_data(value_data, years)
+    verify_data(value_summaries, years)
 
     # Write files
-    with open(VALUE_JSON, "w") as f:
-        json.dump(value_data, f, indent=2)
+    with open(VALUE_JSON, "wb") as f:
+        f.write(orjson.dumps(value_data, option=orjson.OPT_INDENT_2))
     print(f"\nWritten: {VALUE_JSON}")
 
-    with open(VOLUME_JSON, "w") as f:
-        json.dump(volume_data, f, indent=2)
+    with open(VOLUME_JSON, "wb") as f:
+        f.write(orjson.dumps(volume_data, option=orjson.OPT_INDENT_2))
     print(f"Written: {VOLUME_JSON}")
 
-    with open(SEG_JSON, "w") as f:
-        json.dump(seg_analysis, f, indent=2)
+    with open(SEG_JSON, "wb") as f:
+        f.write(orjson.dumps(seg_analysis, option=orjson.OPT_INDENT_2))
     print(f"Written: {SEG_JSON}")
 
     # Summary